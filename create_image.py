@@ -1,8 +1,32 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont, PngImagePlugin, ImageFilter
 
+from parallel_png import MIN_PADDING_CHUNK, PADDING_KEYWORD, save_png_parallel
+
+# 背景填充每个分块的像素数上限（控制临时数组内存）
+FILL_BLOCK_PIXELS = 1 << 20
+# 熵值校准时采样块的边长和块数
+FILL_SAMPLE_SIDE = 256
+FILL_SAMPLE_TILES = 4
+# 采样块左上角的对齐步长
+FILL_SAMPLE_ALIGN = 64
+# ICO 校准时生成整幅背景的像素数上限
+FILL_ICO_SAMPLE_PIXELS = 1 << 22
+# 校准目标占 target_size 的比例，剩余部分留给文字/蒙版波动和精确填充
+FILL_TARGET_RATIO = 0.95
+# 图案填充的格子边长
+FILL_PATTERN_CELL = 32
+# 多格式输出默认的格式列表（与界面的格式选项一致）
+SUPPORTED_FORMATS = ('PNG', 'JPEG', 'BMP', 'GIF', 'WEBP', 'ICO', 'TIFF')
+# ICO 单帧最大边长
+ICO_MAX_SIDE = 256
+# 不压缩的格式，编码大小与像素内容无关
+UNCOMPRESSED_FORMATS = ('BMP', 'TIFF')
+
 
 def create_custom_image(
         output_path: str = 'temp.png',
@@ -18,6 +42,9 @@ def create_custom_image(
         font_size: int = 30,
         resize_method: str = 'cover',
         circle_mask: bool = False,
+        background_fill: str = None,
+        fill_entropy: float = None,
+        png_workers: int = 1,
 ):
     """
     生成指定尺寸、格式、文件大小的图片，支持背景色/背景图、文字叠加和圆形裁剪
@@ -39,6 +66,107 @@ def create_custom_image(
             - 'none': 保持原图尺寸
             - 'fill': 短边贴边，长边居中裁剪
         circle_mask (bool): 是否裁剪为圆形（需要正方形尺寸）
+        background_fill (str): 无背景图片时的像素填充方式
+            - None: 纯色背景
+            - 'noise': 背景色叠加随机噪点
+            - 'gradient': 背景色到反色的渐变叠加噪点
+            - 'pattern': 背景色与反色的棋盘格叠加噪点
+        fill_entropy (float): 填充噪点强度（0~1），为 None 时按 target_size 自动校准
+        png_workers (int): PNG 编码线程数，1 为 PIL 单线程编码，0 或 None 使用全部 CPU 核心
+
+    Returns:
+        dict: 输出结果摘要（见 save_padded_image）
+    """
+    img = render_custom_image(
+        width, height, target_size, (format,), background_color, background_image, text, text_color,
+        font_path, font_size, resize_method, circle_mask, background_fill, fill_entropy
+    )
+    return save_padded_image(img, output_path, target_size, format, png_workers)
+
+
+def create_multi_format_images(
+        output_path: str = 'temp.png',
+        formats: tuple = SUPPORTED_FORMATS,
+        width: int = 1,
+        height: int = 1,
+        target_size: float = 1,
+        background_color: tuple = (255, 255, 255),
+        background_image: str = None,
+        text: str = None,
+        text_color: tuple = (255, 255, 255),
+        font_path: str = None,
+        font_size: int = 30,
+        resize_method: str = 'cover',
+        circle_mask: bool = False,
+        background_fill: str = None,
+        fill_entropy: float = None,
+        png_workers: int = 1,
+        max_workers: int = None,
+):
+    """
+    只渲染一次图片，再并行编码为多种格式，并分别填充到同一目标大小
+
+    Args:
+        output_path (str): 输出路径，扩展名按格式替换（如 temp.png -> temp.jpeg）
+        formats (tuple): 需要输出的格式列表（默认全部支持的格式，重复项会被忽略，不支持的格式抛出 ValueError）
+        max_workers (int): 并行编码的线程数，为 None 时每个格式一个线程
+        其余参数同 create_custom_image
+
+    Returns:
+        dict: 格式 -> 结果摘要，编码失败的格式包含 'error'
+    """
+    # 去重，避免两个线程写同一路径
+    formats = list(dict.fromkeys(f.upper() for f in formats))
+    if not formats:
+        raise ValueError("formats不能为空")
+    unsupported = [f for f in formats if f not in SUPPORTED_FORMATS]
+    if unsupported:
+        raise ValueError(f"不支持的格式：{', '.join(unsupported)}")
+
+    img = render_custom_image(
+        width, height, target_size, formats, background_color, background_image, text, text_color,
+        font_path, font_size, resize_method, circle_mask, background_fill, fill_entropy
+    )
+    img.load()
+    stem = os.path.splitext(output_path)[0]
+
+    def encode(format_upper):
+        path = f"{stem}.{format_upper.lower()}"
+        try:
+            # Image.save 会把编码参数存在图片对象上，每个线程必须使用独立的副本
+            return save_padded_image(img.copy(), path, target_size, format_upper, png_workers)
+        except Exception as e:
+            print(f"{format_upper}编码失败：{e}")
+            return {'format': format_upper, 'path': path, 'target_size': target_size, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(formats)) as executor:
+        return dict(zip(formats, executor.map(encode, formats)))
+
+
+def render_custom_image(
+        width: int = 1,
+        height: int = 1,
+        target_size: float = 1,
+        formats: tuple = ('PNG',),
+        background_color: tuple = (255, 255, 255),
+        background_image: str = None,
+        text: str = None,
+        text_color: tuple = (255, 255, 255),
+        font_path: str = None,
+        font_size: int = 30,
+        resize_method: str = 'cover',
+        circle_mask: bool = False,
+        background_fill: str = None,
+        fill_entropy: float = None,
+):
+    """
+    渲染图片像素（背景、文字、圆形裁剪），不做编码和填充
+
+    formats 仅用于背景填充的熵值校准：取各格式校准结果的最小值，保证所有格式都不超过目标大小。
+    其余参数同 create_custom_image。
+
+    Returns:
+        Image.Image: RGB 图片，圆形裁剪时为 RGBA
     """
 
     # 1. 创建基础图片
@@ -69,6 +197,18 @@ def create_custom_image(
                 width, height = img.size
             else:
                 raise ValueError("无效的resize_method参数")
+        elif background_fill:
+            # 使用可控熵的像素填充，使编码后的文件大小接近目标
+            if fill_entropy is None:
+                fill_entropy = min(
+                    calibrate_fill_entropy(
+                        width, height, target_size, format, background_fill, background_color,
+                        mode='RGBA' if circle_mask else 'RGB', circle_mask=circle_mask
+                    )
+                    for format in formats
+                )
+            print(f"背景填充：{background_fill}，熵值：{fill_entropy:.3f}")
+            img = generate_fill_background(width, height, background_fill, fill_entropy, background_color)
         else:
             # 使用纯色背景
             img = Image.new('RGB', (width, height), color=background_color)
@@ -122,45 +262,87 @@ def create_custom_image(
         img.putalpha(mask)
         img = img.filter(ImageFilter.SMOOTH_MORE)
 
+    return img
+
+
+def save_padded_image(img, output_path, target_size, format='PNG', png_workers=1):
+    """
+    按格式完成兼容性转换、编码保存，并填充到目标文件大小
+
+    Args:
+        img (Image.Image): render_custom_image 渲染的图片（不会被修改）
+        output_path (str): 输出路径
+        target_size (float): 目标文件大小（字节）
+        format (str): 图片格式
+        png_workers (int): PNG 编码线程数，同 create_custom_image
+
+    Returns:
+        dict: {'format', 'path', 'size', 'target_size', 'size_diff'}，
+            size_diff = size - target_size，非 0 表示无法精确填充（编码结果已超出或差距小于一个填充 chunk）
+    """
+
     # 4. 格式兼容性处理
     format_upper = format.upper()
 
     if format_upper == 'JPEG':
         img = img.convert('RGB')
+    elif format_upper == 'GIF' and img.mode == 'RGB':
+        img = img.convert('P', palette=Image.Palette.ADAPTIVE)
+    elif format_upper == 'ICO' and max(img.size) > ICO_MAX_SIDE:
+        # 预先缩小，避免编码器为每个图标尺寸复制整张原图
+        img = img.copy()
+        img.thumbnail((ICO_MAX_SIDE, ICO_MAX_SIDE), resample=Image.Resampling.LANCZOS)
 
     # 5. 保存基础图片前创建目录
     output_dir = os.path.dirname(output_path)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)  # 自动创建目录
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)  # 自动创建目录（多格式并行时可能同时创建）
+
+    # PNG 多线程分块编码，填充 chunk 在同一次写入中完成
+    if format_upper == 'PNG' and png_workers != 1:
+        size = save_png_parallel(img, output_path, target_size, workers=png_workers or None)
+        return {
+            'format': format_upper,
+            'path': output_path,
+            'size': size,
+            'target_size': target_size,
+            'size_diff': size - target_size,
+        }
 
     # 5. 保存基础图片
-    img.save(output_path, format=format.upper(), quality=100)
+    img.save(output_path, format=format_upper, quality=100)
 
     # 6. 计算需要填充的字节数
     current_size = os.path.getsize(output_path)
     target_bytes = target_size
     required_padding = int(target_bytes - current_size)
 
-    if format_upper == 'PNG':
-        required_padding = required_padding - 28
-
     print(f"图片尺寸：{target_bytes}，当前大小：{current_size}字节，需要填充：{required_padding}字节")
 
-    # 符合目标大小
-    if required_padding == 0:
-        img.save(output_path, format)
-        return
-
-    # 7. 根据格式选择填充方式
+    # 7. 根据格式选择填充方式（PNG 的填充 chunk 至少 14 字节，差距不足时不填充；与多线程编码规则一致）
     if format_upper == 'PNG':
-        metadata = b'A' * required_padding
-        pnginfo = PngImagePlugin.PngInfo()
-        pnginfo.add_text("Custom_Metadata", metadata.decode(), zip=False)
-        img.save(output_path, format='PNG', pnginfo=pnginfo)
-    else:
+        if required_padding >= MIN_PADDING_CHUNK:
+            keyword = PADDING_KEYWORD[:required_padding - MIN_PADDING_CHUNK + 1]
+            metadata = b'A' * (required_padding - 12 - len(keyword) - 1)
+            pnginfo = PngImagePlugin.PngInfo()
+            pnginfo.add_text(keyword.decode(), metadata.decode(), zip=False)
+            img.save(output_path, format='PNG', pnginfo=pnginfo)
+    elif required_padding > 0:
         with open(output_path, 'ab') as f:
             f.write(b'\x00' * required_padding)
 
+    size = os.path.getsize(output_path)
+    if size != target_size:
+        print(f"无法精确填充到目标大小，相差{target_size - size}字节")
+
+    return {
+        'format': format_upper,
+        'path': output_path,
+        'size': size,
+        'target_size': target_size,
+        'size_diff': size - target_size,
+    }
+
 
 def fill_resize(img, target_width, target_height):
     """
@@ -185,3 +367,139 @@ def fill_resize(img, target_width, target_height):
         top = (new_height - target_height) // 2
         img = img.crop((0, int(top), target_width, int(top + target_height)))
     return img
+
+
+def generate_fill_background(width, height, fill='noise', entropy=0.5, background_color=(255, 255, 255), seed=0,
+                             box=None):
+    """
+    按行分块向量化生成可控熵的 RGB 背景
+
+    底图由 fill 决定（纯色/渐变/棋盘格），再叠加均匀随机噪点，噪点幅度为 256 ** entropy（连续取值）。
+    噪点朝远离边界的方向叠加（亮色减、暗色加），幅度不超过到边界的距离，因此不会溢出回绕；
+    中间色调的最大噪点幅度约为 128。
+
+    box 为 (left, top, right, bottom) 时只生成整幅 width x height 背景中的该区域，用于熵值校准采样。
+    """
+    if fill not in ('noise', 'gradient', 'pattern'):
+        raise ValueError("无效的background_fill参数")
+
+    entropy = min(max(float(entropy), 0.0), 1.0)
+    amplitude = np.float32(256 ** entropy)
+    color = np.array(background_color[:3], dtype=np.int16)
+    inverse = 255 - color
+
+    left, top, right, bottom = box or (0, 0, width, height)
+    region_width = right - left
+
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((bottom - top, region_width, 3), dtype=np.uint8)
+    block_rows = max(1, FILL_BLOCK_PIXELS // max(region_width, 1))
+    xs = np.arange(left, right)
+
+    for block_top in range(top, bottom, block_rows):
+        rows = min(block_rows, bottom - block_top)
+        ys = np.arange(block_top, block_top + rows)
+
+        if fill == 'gradient':
+            # 左上到右下的对角渐变
+            t = (xs[None, :] / max(width - 1, 1) + ys[:, None] / max(height - 1, 1)) / 2
+            base = (color + (inverse - color) * t[..., None]).astype(np.int16)
+        elif fill == 'pattern':
+            cells = ((xs[None, :] // FILL_PATTERN_CELL) + (ys[:, None] // FILL_PATTERN_CELL)) & 1
+            base = np.where(cells[..., None].astype(bool), inverse, color)
+        else:
+            base = np.broadcast_to(color, (rows, region_width, 3))
+
+        if entropy > 0:
+            bright = base >= 128
+            # 噪点取值 [0, limit)，limit 不超过到边界的距离 + 1
+            limit = np.minimum(amplitude, np.where(bright, base, 255 - base) + 1).astype(np.float32)
+            noise = (rng.random((rows, region_width, 3), dtype=np.float32) * limit).astype(np.int16)
+            block = np.where(bright, base - noise, base + noise)
+        else:
+            block = base
+        pixels[block_top - top:block_top - top + rows] = block
+
+    return Image.fromarray(pixels, 'RGB')
+
+
+def calibrate_fill_entropy(width, height, target_size, format, fill, background_color=(255, 255, 255), mode='RGB',
+                           circle_mask=False):
+    """
+    二分查找填充熵值，使目标格式编码后的大小接近 target_size * FILL_TARGET_RATIO
+
+    沿对角线从整幅背景中裁取 FILL_SAMPLE_TILES 块不超过 FILL_SAMPLE_SIDE 见方的采样块编码，
+    再按面积外推整图大小，渐变等随位置变化的底图也能得到接近的估计。
+    GIF 的调色板按采样块单独生成，颜色跨度大的渐变会偏向低估（文件偏小，由填充补足）。
+    ICO 与 save_padded_image 一致：生成整幅背景后按比例缩小到 ICO_MAX_SIDE 以内再编码；
+    整幅背景超过 FILL_ICO_SAMPLE_PIXELS 时按比例缩小生成，降采样的平均效果变弱，结果偏向低估。
+    circle_mask 为 True 时对采样块应用与圆形裁剪相同的椭圆透明度和 SMOOTH_MORE 滤镜
+    （WEBP 等格式会丢弃全透明像素的颜色，SMOOTH_MORE 会削弱噪点）。
+    """
+    format_upper = format.upper()
+    # 文件大小与熵值无关，直接使用满幅噪点，也不会拉低多格式校准的最小值
+    if format_upper in UNCOMPRESSED_FORMATS:
+        return 1.0
+
+    tile_width = min(width, FILL_SAMPLE_SIDE)
+    tile_height = min(height, FILL_SAMPLE_SIDE)
+    if format_upper == 'ICO':
+        # ICO 编码的是缩小到 256px 以内的整图，大小不随原图尺寸增长
+        shrink = min(1.0, (FILL_ICO_SAMPLE_PIXELS / (width * height)) ** 0.5)
+        sample_fields = [(max(1, int(width * shrink)), max(1, int(height * shrink)), None)]
+        scale = 1
+    else:
+        tiles = min(FILL_SAMPLE_TILES, max((width * height) // (tile_width * tile_height), 1))
+        sample_fields = []
+        for index in range(tiles):
+            position = (index + 0.5) / tiles
+            # 对齐到图案周期（同时是 JPEG 8x8 块的整数倍），使采样块的块边界分布与整图一致
+            left = int((width - tile_width) * position) // FILL_SAMPLE_ALIGN * FILL_SAMPLE_ALIGN
+            top = int((height - tile_height) * position) // FILL_SAMPLE_ALIGN * FILL_SAMPLE_ALIGN
+            sample_fields.append((width, height, (left, top, left + tile_width, top + tile_height)))
+        scale = (width * height) / (tile_width * tile_height * tiles)
+    goal = target_size * FILL_TARGET_RATIO
+
+    def estimate(entropy):
+        total = 0
+        for field_width, field_height, box in sample_fields:
+            sample = generate_fill_background(
+                field_width, field_height, fill, entropy, background_color, box=box
+            ).convert(mode)
+            if circle_mask:
+                sample.putalpha(_circle_alpha(field_width, field_height, box))
+                sample = sample.filter(ImageFilter.SMOOTH_MORE)
+            if format_upper == 'JPEG':
+                sample = sample.convert('RGB')
+            elif format_upper == 'ICO':
+                sample.thumbnail((ICO_MAX_SIDE, ICO_MAX_SIDE), resample=Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            sample.save(buffer, format=format_upper, quality=100)
+            # ICO 编码器会回写文件头，tell() 不是文件大小
+            total += len(buffer.getvalue())
+        return total * scale
+
+    if estimate(1.0) <= goal:
+        return 1.0
+    if estimate(0.0) >= goal:
+        return 0.0
+
+    low, high = 0.0, 1.0
+    for _ in range(12):
+        middle = (low + high) / 2
+        if estimate(middle) > goal:
+            high = middle
+        else:
+            low = middle
+    return low
+
+
+def _circle_alpha(width, height, box=None):
+    """
+    生成整幅 width x height 内切椭圆在 box 区域内的透明度（内部 255，外部 0）
+    """
+    left, top, right, bottom = box or (0, 0, width, height)
+    xs = (np.arange(left, right) + 0.5 - width / 2) / (width / 2)
+    ys = (np.arange(top, bottom) + 0.5 - height / 2) / (height / 2)
+    inside = xs[None, :] ** 2 + ys[:, None] ** 2 <= 1
+    return Image.fromarray(np.where(inside, 255, 0).astype(np.uint8), 'L')
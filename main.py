@@ -6,7 +6,7 @@ import wx
 import wx.lib.colourselect as colourselect
 from PIL import Image
 from datetime import datetime
-from create_image import create_custom_image
+from create_image import create_custom_image, create_multi_format_images, SUPPORTED_FORMATS
 
 Image.MAX_IMAGE_PIXELS = None
 
@@ -42,22 +42,15 @@ class ImageGeneratorUI(wx.Frame):
                     "default_choice": 2  # 默认选中MB
                 }
             ], None, None, 0, 104857600, 1.0),
-            ("格式", wx.Choice, None, wx.EVT_CHOICE, [
-                "PNG",
-                "JPEG",
-                "BMP",
-                "GIF",
-                "WEBP",
-                "ICO",
-                "TIFF",
-            ])
+            ("格式", wx.Choice, None, wx.EVT_CHOICE, list(SUPPORTED_FORMATS))
         ])
 
         # 背景设置
         self.add_param_group(input_sizer, "背景设置", [
             ("背景颜色", colourselect.ColourSelect, None, colourselect.EVT_COLOURSELECT, wx.WHITE),
             ("背景图片", wx.TextCtrl, None, None),  # 移除 on_background_image
-            ("缩放方式", wx.Choice, None, wx.EVT_CHOICE, ['fill', 'cover', 'contain', 'none'])
+            ("缩放方式", wx.Choice, None, wx.EVT_CHOICE, ['fill', 'cover', 'contain', 'none']),
+            ("背景填充", wx.Choice, None, wx.EVT_CHOICE, ['none', 'noise', 'gradient', 'pattern'])
         ])
 
         # 文字设置
@@ -73,6 +66,12 @@ class ImageGeneratorUI(wx.Frame):
         self.circle_mask_checkbox = wx.CheckBox(input_panel, label="圆形")
         self.circle_mask_checkbox.Bind(wx.EVT_CHECKBOX, self.on_param_changed)  # 关键：绑定事件
         advanced_sizer.Add(self.circle_mask_checkbox, 0, wx.ALL | wx.EXPAND, 5)
+        self.png_workers_checkbox = wx.CheckBox(input_panel, label="PNG多线程编码")
+        self.png_workers_checkbox.Bind(wx.EVT_CHECKBOX, self.on_param_changed)
+        advanced_sizer.Add(self.png_workers_checkbox, 0, wx.ALL | wx.EXPAND, 5)
+        # 保存时只渲染一次，导出全部格式（预览仍使用所选格式）
+        self.all_formats_checkbox = wx.CheckBox(input_panel, label="导出全部格式")
+        advanced_sizer.Add(self.all_formats_checkbox, 0, wx.ALL | wx.EXPAND, 5)
 
         input_sizer.Add(advanced_sizer, 0, wx.ALL | wx.EXPAND, 10)
 
@@ -306,6 +305,8 @@ class ImageGeneratorUI(wx.Frame):
 
         print(f"target_size:{target_size}")
 
+        background_fill = self.params["背景填充"].GetStringSelection()
+
         return {
             'output_path': output_path,
             'width': int(self.params["宽度"].GetValue()),  # 强制转换为int
@@ -323,7 +324,9 @@ class ImageGeneratorUI(wx.Frame):
             'font_path': self.params["字体路径"].GetValue(),
             'font_size': int(self.params["字体大小"].GetValue()),  # 强制转换为int
             'resize_method': self.params["缩放方式"].GetStringSelection(),
-            'circle_mask': self.circle_mask_checkbox.GetValue()
+            'circle_mask': self.circle_mask_checkbox.GetValue(),
+            'background_fill': None if background_fill == 'none' else background_fill,
+            'png_workers': 0 if self.png_workers_checkbox.GetValue() else 1  # 0：使用全部核心并行编码
         }
 
     def update_preview(self):
@@ -398,6 +401,11 @@ class ImageGeneratorUI(wx.Frame):
     def on_generate(self, event):
         try:
             preview_params = self.get_params()
+
+            if self.all_formats_checkbox.GetValue():
+                self.save_all_formats(preview_params)
+                return
+
             temp_path = preview_params['output_path']
             format = preview_params['format'].upper()
 
@@ -448,6 +456,43 @@ class ImageGeneratorUI(wx.Frame):
                 "错误"
             ).ShowModal()
 
+    def save_all_formats(self, params):
+        """渲染一次，导出全部格式并显示每个格式的结果"""
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+        with wx.FileDialog(
+                self,
+                "保存全部格式的图片（扩展名按格式自动替换）",
+                wildcard="All files (*.*)|*.*",
+                style=wx.FD_SAVE,
+                defaultFile=f"image_{timestamp}"
+        ) as dlg:
+            if dlg.ShowModal() != wx.ID_OK:
+                print("保存操作已取消")
+                return
+            output_path = dlg.GetPath()
+
+        params.pop('format')
+        params['output_path'] = output_path
+        results = create_multi_format_images(formats=SUPPORTED_FORMATS, **params)
+
+        lines = []
+        for format, result in results.items():
+            if 'error' in result:
+                lines.append(f"{format}：失败（{result['error']}）")
+            elif result['size_diff'] > 0:
+                lines.append(f"{format}：{result['size']}字节，超出目标{result['size_diff']}字节")
+            elif result['size_diff'] < 0:
+                lines.append(f"{format}：{result['size']}字节，距目标不足{-result['size_diff']}字节")
+            else:
+                lines.append(f"{format}：{result['size']}字节")
+
+        wx.GenericMessageDialog(
+            self,
+            "\n".join(lines),
+            "导出结果"
+        ).ShowModal()
+
 
 if __name__ == "__main__":
     app = wx.App(redirect=False)
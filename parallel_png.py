@@ -0,0 +1,212 @@
+import math
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PIL 支持直接写出的 8 位模式 -> (PNG 颜色类型, 每像素字节数)
+PNG_COLOR_TYPES = {
+    'L': (0, 1),
+    'RGB': (2, 3),
+    'LA': (4, 2),
+    'RGBA': (6, 4),
+}
+# 每个分块的原始数据量，分块越小并行度越高，但跨块压缩率略有损失
+BAND_BYTES = 1 << 22
+# deflate 滑动窗口大小，用上一分块末尾的过滤数据预置字典
+DEFLATE_WINDOW = 1 << 15
+# 单个 chunk 的最大数据长度
+MAX_CHUNK_LENGTH = (1 << 31) - 1
+# 填充 tEXt chunk 的关键字，与 create_custom_image 的元数据填充保持一致，剩余字节不足时截短
+PADDING_KEYWORD = b'Custom_Metadata'
+# 最小的填充 chunk：长度(4) + 类型(4) + CRC(4) + 1 字节关键字 + 分隔符(1)
+MIN_PADDING_CHUNK = 12 + 1 + 1
+
+
+def save_png_parallel(img, output_path, target_size=None, workers=None, compress_level=6):
+    """
+    多线程分块编码 PNG，并在同一次写入中追加填充 chunk
+
+    图片按行切成若干分块，每个分块独立做 Paeth 过滤和 raw deflate，
+    非末尾分块以 Z_SYNC_FLUSH 结束，拼接后即是一条合法的 zlib 数据流，
+    adler32 由各分块校验和合并得到。
+
+    Args:
+        img (Image.Image): 待保存的图片
+        output_path (str): 输出路径
+        target_size (int): 目标文件大小（字节），为 None 时不填充
+        workers (int): 线程数，为 None 时使用全部 CPU 核心
+        compress_level (int): zlib 压缩级别（0~9）
+
+    Returns:
+        int: 写入的文件大小（字节）。与 target_size 不一致表示无法精确填充：
+            差距为 1~13 字节（小于最小 chunk）或编码结果已超过目标大小
+    """
+    if img.mode not in PNG_COLOR_TYPES:
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    color_type, bpp = PNG_COLOR_TYPES[img.mode]
+
+    width, height = img.size
+    row_bytes = width * bpp
+    pixels = np.asarray(img, dtype=np.uint8).reshape(height, row_bytes)
+
+    band_rows = max(1, BAND_BYTES // (row_bytes + 1))
+    bands = [(top, min(top + band_rows, height)) for top in range(0, height, band_rows)]
+
+    def deflate(band):
+        top, bottom = band
+        return _deflate_band(pixels, bpp, top, bottom, compress_level, bottom == height)
+
+    with open(output_path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        size = len(PNG_SIGNATURE)
+        size += _write_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+
+        checksum = 1
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            for index, (data, band_checksum, band_length) in enumerate(executor.map(deflate, bands)):
+                checksum = _adler32_combine(checksum, band_checksum, band_length)
+                if index == 0:
+                    data = _zlib_header(compress_level) + data
+                if index == len(bands) - 1:
+                    data += struct.pack('>I', checksum)
+                for start in range(0, len(data), MAX_CHUNK_LENGTH):
+                    size += _write_chunk(f, b'IDAT', data[start:start + MAX_CHUNK_LENGTH])
+
+        # 在 IEND 前写入填充 chunk，一次写盘即达到目标大小
+        if target_size is not None:
+            required_padding = int(target_size - size - 12)
+            print(f"图片尺寸：{target_size}，当前大小：{size + 12}字节，需要填充：{required_padding}字节")
+            while required_padding >= MIN_PADDING_CHUNK:
+                chunk_size = min(required_padding, MAX_CHUNK_LENGTH + 12)
+                # 超大填充拆分多个 chunk 时，避免最后剩下不足一个 chunk 的字节
+                if 0 < required_padding - chunk_size < MIN_PADDING_CHUNK:
+                    chunk_size -= MIN_PADDING_CHUNK
+                keyword = PADDING_KEYWORD[:chunk_size - MIN_PADDING_CHUNK + 1]
+                text_length = chunk_size - 12 - len(keyword) - 1
+                size += _write_chunk(f, b'tEXt', keyword + b'\x00' + b'A' * text_length)
+                required_padding -= chunk_size
+            if required_padding != 0:
+                print(f"无法精确填充到目标大小，相差{required_padding}字节")
+
+        size += _write_chunk(f, b'IEND', b'')
+
+    return size
+
+
+def _filter_rows(pixels, bpp, top, bottom):
+    """
+    对 [top, bottom) 行做 Paeth 过滤，返回带过滤类型字节的扫描线数据
+    """
+    x = pixels[top:bottom].astype(np.int16)
+    if top > 0:
+        up = pixels[top - 1:bottom - 1].astype(np.int16)
+    else:
+        up = np.vstack([np.zeros((1, x.shape[1]), dtype=np.int16), x[:-1]])
+
+    left = np.zeros_like(x)
+    left[:, bpp:] = x[:, :-bpp]
+    up_left = np.zeros_like(x)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    pa = np.abs(up - up_left)
+    pb = np.abs(left - up_left)
+    pc = np.abs(left + up - 2 * up_left)
+    predictor = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+
+    filtered = np.empty((bottom - top, x.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 4
+    filtered[:, 1:] = (x - predictor) & 0xFF
+    return filtered.tobytes()
+
+
+def _deflate_band(pixels, bpp, top, bottom, compress_level, last):
+    """
+    过滤并压缩一个分块，返回 (raw deflate 数据, adler32, 过滤后数据长度)
+    """
+    data = _filter_rows(pixels, bpp, top, bottom)
+
+    if top > 0:
+        # 重新过滤上一分块末尾若干行作为预置字典，保持跨分块的匹配能力
+        dict_top = max(0, top - math.ceil(DEFLATE_WINDOW / (pixels.shape[1] + 1)))
+        zdict = _filter_rows(pixels, bpp, dict_top, top)[-DEFLATE_WINDOW:]
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+
+    compressed = compressor.compress(data)
+    compressed += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.adler32(data), len(data)
+
+
+def _zlib_header(compress_level):
+    """
+    生成 zlib 数据流头部（CMF + FLG）
+    """
+    cmf = 0x78
+    if compress_level < 2:
+        level_flag = 0
+    elif compress_level < 6:
+        level_flag = 1
+    elif compress_level == 6:
+        level_flag = 2
+    else:
+        level_flag = 3
+    flg = level_flag << 6
+    flg += 31 - (cmf * 256 + flg) % 31
+    return bytes((cmf, flg))
+
+
+def _adler32_combine(adler1, adler2, length2):
+    """
+    合并两段数据的 adler32 校验和（移植自 zlib 的 adler32_combine）
+    """
+    base = 65521
+    remainder = length2 % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % base
+    sum1 += (adler2 & 0xFFFF) + base - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + base - remainder
+    sum1 %= base
+    sum2 %= base
+    return (sum2 << 16) | sum1
+
+
+def _write_chunk(f, chunk_type, data):
+    """
+    写入一个 PNG chunk，返回写入的字节数
+    """
+    f.write(struct.pack('>I', len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+    return len(data) + 12
+
+
+if __name__ == "__main__":
+    # 简易基准：对比 PIL 单线程编码与不同线程数的分块编码
+    from create_image import generate_fill_background
+
+    image = generate_fill_background(8000, 8000, 'gradient', 0.3)
+    start = time.perf_counter()
+    image.save('benchmark_pil.png', format='PNG')
+    baseline = time.perf_counter() - start
+    print(f"PIL：{baseline:.2f}s，{os.path.getsize('benchmark_pil.png')}字节")
+
+    thread_counts = sorted({1, 2, 4, 8, 16, 32, os.cpu_count()})
+    for count in thread_counts:
+        if count > os.cpu_count():
+            continue
+        start = time.perf_counter()
+        written = save_png_parallel(image, 'benchmark_parallel.png', workers=count)
+        elapsed = time.perf_counter() - start
+        print(f"{count}线程：{elapsed:.2f}s，加速比{baseline / elapsed:.2f}，{written}字节")
+
+    Image.open('benchmark_parallel.png').load()
+    os.remove('benchmark_pil.png')
+    os.remove('benchmark_parallel.png')
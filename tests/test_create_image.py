@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_image
+from create_image import (
+    SUPPORTED_FORMATS,
+    calibrate_fill_entropy,
+    create_multi_format_images,
+    generate_fill_background,
+)
+
+
+@pytest.mark.parametrize('color', [(128, 128, 128), (200, 50, 254), (0, 0, 0), (255, 255, 255)])
+def test_fill_noise_does_not_wrap(color):
+    pixels = np.asarray(generate_fill_background(200, 200, 'noise', 1.0, color)).astype(int)
+    for channel, value in enumerate(color):
+        if value >= 128:
+            assert pixels[..., channel].max() == value
+        else:
+            assert pixels[..., channel].min() == value
+
+
+def test_fill_box_matches_full_field():
+    full = np.asarray(generate_fill_background(300, 200, 'gradient', 0.0))
+    crop = np.asarray(generate_fill_background(300, 200, 'gradient', 0.0, box=(64, 64, 192, 128)))
+    assert np.array_equal(crop, full[64:128, 64:192])
+
+
+def test_fill_entropy_is_continuous():
+    sizes = []
+    for entropy in (0.02, 0.04, 0.06, 0.08):
+        buffer = BytesIO()
+        generate_fill_background(256, 256, 'noise', entropy).save(buffer, format='PNG')
+        sizes.append(buffer.tell())
+    assert sizes == sorted(sizes) and len(set(sizes)) == len(sizes)
+
+
+@pytest.mark.parametrize('fill', ['noise', 'gradient', 'pattern'])
+@pytest.mark.parametrize('format, target_size', [('PNG', 3 * 1024 * 1024), ('JPEG', 3 * 1024 * 1024), ('ICO', 160 * 1024)])
+def test_calibrated_fill_lands_near_target(fill, format, target_size):
+    entropy = calibrate_fill_entropy(2000, 2000, target_size, format, fill)
+    image = generate_fill_background(2000, 2000, fill, entropy)
+    if format == 'ICO':
+        image.thumbnail((256, 256), resample=Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, format=format, quality=100)
+    assert 0.85 * target_size < len(buffer.getvalue()) <= target_size
+
+
+def test_multi_format_fan_out(tmp_path, monkeypatch):
+    # 所有格式的编码线程同时进入 save_padded_image，并记录各自拿到的图片对象
+    received = []
+    barrier = threading.Barrier(len(SUPPORTED_FORMATS))
+    save = create_image.save_padded_image
+
+    def concurrent_save(img, *args):
+        received.append(id(img))
+        barrier.wait(timeout=30)
+        return save(img, *args)
+
+    monkeypatch.setattr(create_image, 'save_padded_image', concurrent_save)
+    target_size = 1024 * 1024
+    results = create_multi_format_images(
+        str(tmp_path / 'fixture.png'), width=300, height=300, target_size=target_size,
+        background_fill='noise', text='hello'
+    )
+
+    # Image.save 把编码参数存在图片对象上，每个线程必须拿到独立的副本
+    assert len(set(received)) == len(SUPPORTED_FORMATS)
+    assert list(results) == list(SUPPORTED_FORMATS)
+    for format, result in results.items():
+        assert 'error' not in result, result
+        assert result['size'] == target_size == os.path.getsize(result['path'])
+        Image.open(result['path']).load()
+    assert 'Custom_Metadata' in Image.open(results['PNG']['path']).text
+    assert Image.open(results['BMP']['path']).format == 'BMP'
+
+
+def test_multi_format_formats_guard(tmp_path):
+    with pytest.raises(ValueError):
+        create_multi_format_images(str(tmp_path / 'fixture.png'), formats=())
+    with pytest.raises(ValueError):
+        create_multi_format_images(str(tmp_path / 'fixture.png'), formats=('PNG', 'SVG'), background_fill='noise')
+
+    results = create_multi_format_images(
+        str(tmp_path / 'fixture.png'), formats=('png', 'PNG', 'jpeg'), width=50, height=50, target_size=100000
+    )
+    assert list(results) == ['PNG', 'JPEG']
+
+
+def test_ico_fill_is_calibrated(tmp_path):
+    target_size = 60 * 1024
+    entropy = calibrate_fill_entropy(1000, 1000, target_size, 'ICO', 'noise')
+    results = create_multi_format_images(
+        str(tmp_path / 'fixture.ico'), formats=('ICO',), width=1000, height=1000, target_size=target_size,
+        background_fill='noise'
+    )
+
+    assert 0 < entropy < 1
+    assert results['ICO']['size'] == target_size == os.path.getsize(results['ICO']['path'])
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parallel_png
+from create_image import generate_fill_background, save_padded_image
+from parallel_png import MIN_PADDING_CHUNK, save_png_parallel
+
+
+@pytest.fixture
+def image():
+    return generate_fill_background(301, 97, 'gradient', 0.4)
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'LA', 'P'])
+def test_roundtrip_many_bands(tmp_path, monkeypatch, image, mode):
+    monkeypatch.setattr(parallel_png, 'BAND_BYTES', 5000)
+    source = image.convert(mode)
+    path = tmp_path / 'out.png'
+    size = save_png_parallel(source, path, workers=4)
+
+    decoded = Image.open(path)
+    decoded.load()
+    expected = source if mode in parallel_png.PNG_COLOR_TYPES else source.convert('RGB')
+    assert size == os.path.getsize(path)
+    assert decoded.mode == expected.mode
+    assert np.array_equal(np.asarray(decoded), np.asarray(expected))
+
+
+@pytest.mark.parametrize('gap', [0, 1, 10, 13, 14, 15, 27, 28, 29, 100000])
+def test_padding_gap(tmp_path, image, gap):
+    base_size = save_png_parallel(image, tmp_path / 'base.png')
+    path = tmp_path / 'out.png'
+    size = save_png_parallel(image, path, target_size=base_size + gap)
+
+    Image.open(path).load()
+    assert size == os.path.getsize(path)
+    if gap == 0 or gap >= MIN_PADDING_CHUNK:
+        assert size == base_size + gap
+    else:
+        assert size == base_size
+
+
+def test_summary_reports_miss(tmp_path, image):
+    summary = save_padded_image(image, str(tmp_path / 'out.png'), 100, 'PNG', png_workers=2)
+    assert summary['size_diff'] == summary['size'] - 100 > 0
+
+    summary = save_padded_image(image, str(tmp_path / 'out.png'), 200000, 'PNG', png_workers=2)
+    assert summary['size'] == 200000 and summary['size_diff'] == 0
+
+
+@pytest.mark.parametrize('gap', [0, 1, 13, 14, 20, 27, 28, 1000])
+def test_padding_gap_same_for_both_encoders(tmp_path, image, gap):
+    diffs = []
+    for png_workers in (1, 2):
+        path = str(tmp_path / f'{png_workers}.png')
+        base_size = save_padded_image(image, path, 0, 'PNG', png_workers)['size']
+        summary = save_padded_image(image, path, base_size + gap, 'PNG', png_workers)
+        Image.open(path).load()
+        diffs.append(summary['size_diff'])
+
+    expected = 0 if gap == 0 or gap >= MIN_PADDING_CHUNK else -gap
+    assert diffs == [expected, expected]